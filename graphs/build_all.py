@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import os
+import runpy
+import shutil
+import subprocess
+import sys
+from fdgraph import cache_path, is_stale, save_source, store_in_cache
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+def dot(sources):
+    # -O names each output <source>.svg.
+    subprocess.run(["dot", "-Tsvg", "-O", *sources], check=True)
+
+
+# Every DOT source is written, but only the graphs named on the command line (all
+# of them by default) are rendered, and only if their SVG is missing or stale.
+wanted = set(sys.argv[1:])
+
+found = set()
+stale = []
+for script in sorted(glob.glob(os.path.join(here, "*-graph.py"))):
+    G = runpy.run_path(script)["G"]
+    G.directory = here
+    source = save_source(G)
+    found.add(G.name)
+    if (wanted and G.name not in wanted) or not is_stale(G):
+        continue
+    stale.append((source, cache_path(G.source)))
+
+unknown = wanted - found
+if unknown:
+    sys.exit(f"Unknown graphs: {', '.join(sorted(unknown))}")
+
+misses = []
+for source, cached in stale:
+    if os.path.exists(cached):
+        shutil.copyfile(cached, source + ".svg")
+    else:
+        misses.append((source, cached))
+
+if misses:
+    # Share the layouts between at most one dot process per core.
+    sources = [source for source, _ in misses]
+    jobs = min(len(sources), os.cpu_count() or 1)
+    with ThreadPoolExecutor(jobs) as pool:
+        list(pool.map(dot, [sources[i::jobs] for i in range(jobs)]))
+    for source, cached in misses:
+        store_in_cache(source + ".svg", cached)
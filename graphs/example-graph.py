@@ -1,5 +1,6 @@
 import graphviz as gv
 from fdgraph import (
+    cached_render,
     c_col,
     q_col,
     n_col,
@@ -166,4 +167,5 @@ G.edge("m3n", "mwhiletop", color=c_col)
 G.edge("mf2", "mwhiletop", color=q_col)
 G.edge("mf2", "mwhiletop", color=q_col)
 
-G.render(format="svg")
+if __name__ == "__main__":
+    cached_render(G.source, G.save() + ".svg")
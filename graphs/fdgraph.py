@@ -1,3 +1,10 @@
+import os
+import sys
+
+# The render cache lives in qpr, one directory up.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qpr import cache_path, cached_render, store_in_cache  # noqa: E402, F401
+
 c_col = "black"
 q_col = "blue"
 n_col = "grey"
@@ -12,3 +19,22 @@ fin_attrs = {
 decision_attrs = {"shape": "hexagon", "color": "green", "penwidth": "3"}
 choice_attrs = {"label": "", "shape": "point", "height": "0.2", "color": "green"}
 fn_attrs = {"shape": "ellipse", "fontcolor": "darkorange4"}
+
+
+def save_source(G):
+    # Leave an unchanged source file (and its mtime) alone, so that is_stale stays
+    # false for graphs whose SVG is already up to date.
+    try:
+        with open(G.filepath, encoding=G.encoding) as f:
+            if f.read() == G.source:
+                return G.filepath
+    except FileNotFoundError:
+        pass
+    return G.save()
+
+
+def is_stale(G):
+    target = G.filepath + ".svg"
+    if not os.path.exists(target):
+        return True
+    return os.path.getmtime(target) < os.path.getmtime(G.filepath)
@@ -1,5 +1,5 @@
 import graphviz as gv
-from fdgraph import q_col, init_attrs, fin_attrs, fn_attrs
+from fdgraph import cached_render, q_col, init_attrs, fin_attrs, fn_attrs
 
 G = gv.Digraph("fgh")
 
@@ -19,4 +19,5 @@ G.edge("f", "fin", color=q_col)
 G.edge("g", "fin", color=q_col)
 G.edge("h", "fin", color=q_col)
 
-G.render(format="svg")
+if __name__ == "__main__":
+    cached_render(G.source, G.save() + ".svg")
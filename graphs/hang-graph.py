@@ -1,5 +1,12 @@
 import graphviz as gv
-from fdgraph import c_col, init_attrs, fin_attrs, decision_attrs, choice_attrs
+from fdgraph import (
+    cached_render,
+    c_col,
+    init_attrs,
+    fin_attrs,
+    decision_attrs,
+    choice_attrs,
+)
 
 G = gv.Digraph("hang")
 
@@ -38,4 +45,5 @@ G.edge("J1", "join", label="e", color=c_col)
 
 G.edge("join", "fin", label="e", color=c_col)
 
-G.render(format="svg")
+if __name__ == "__main__":
+    cached_render(G.source, G.save() + ".svg")
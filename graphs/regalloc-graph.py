@@ -1,5 +1,5 @@
 import graphviz as gv
-from fdgraph import c_col, q_col, n_col, init_attrs, fin_attrs, fn_attrs
+from fdgraph import cached_render, c_col, q_col, n_col, init_attrs, fin_attrs, fn_attrs
 
 G = gv.Digraph("regalloc")
 
@@ -27,4 +27,5 @@ G.edge("access", "access2", label="R", color=c_col)
 G.edge("access2", "fin2", label="R[j]", color=q_col)
 G.edge("access2", "fin2", label="R", color=c_col)
 
-G.render(format="svg")
+if __name__ == "__main__":
+    cached_render(G.source, G.save() + ".svg")
@@ -1,5 +1,5 @@
 import graphviz as gv
-from fdgraph import c_col, q_col, n_col, init_attrs, fin_attrs, fn_attrs
+from fdgraph import cached_render, c_col, q_col, n_col, init_attrs, fin_attrs, fn_attrs
 
 G = gv.Digraph("write2")
 
@@ -28,4 +28,5 @@ G.edge("init", "write1", color=n_col)
 G.edge("write0", "fin", color=n_col)
 G.edge("write1", "fin", color=n_col)
 
-G.render(format="svg")
+if __name__ == "__main__":
+    cached_render(G.source, G.save() + ".svg")
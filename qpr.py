@@ -1,12 +1,23 @@
-from dataclasses import dataclass
-import graphviz as gv
-import networkx as nx
+from array import array
+from functools import lru_cache
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import NamedTuple
 
-edge_types = {"Bit", "u32", "Qubit"}
+edge_types = frozenset(sys.intern(s) for s in ("Bit", "u32", "Qubit"))
 
+# Rendered SVGs are cached here, keyed by DOT source; set QPR_CACHE_DIR to move it.
+cache_dir = os.environ.get("QPR_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "build_cache"
+)
 
-@dataclass
-class Sig:
+
+class Sig(NamedTuple):
     in_types: dict[str, str]
     out_types: dict[str, str]
 
@@ -17,62 +28,192 @@ fn_types = {
 }
 
 
+def _interned(types):
+    return {sys.intern(k): sys.intern(v) for k, v in types.items()}
+
+
+_port_dtype = {
+    (sys.intern(fnid), direction, port): datatype
+    for fnid, sig in fn_types.items()
+    for direction, types in (("in", sig.in_types), ("out", sig.out_types))
+    for port, datatype in _interned(types).items()
+}
+
+
+def _check_types(src_datatype, tgt_datatype):
+    if src_datatype != tgt_datatype:
+        raise ValueError(f"Type mismatch: {src_datatype} != {tgt_datatype}")
+
+
+@lru_cache(maxsize=None)
+def _edge_type(src_fnid, src_port, tgt_fnid, tgt_port):
+    src_datatype = _port_dtype[src_fnid, "out", src_port]
+    tgt_datatype = _port_dtype[tgt_fnid, "in", tgt_port]
+    if __debug__:
+        _check_types(src_datatype, tgt_datatype)
+    return src_datatype
+
+
 class QFn:
+    __slots__ = (
+        "name",
+        "sig",
+        "_fnid",
+        "_labels",
+        "_srcs",
+        "_tgts",
+        "_src_port_ids",
+        "_tgt_port_ids",
+        "_dtype_ids",
+        "_port_intern",
+        "_dtype_intern",
+    )
+
     def __init__(self, name, sig):
         self.name = name
-        self.sig = sig
-        self.G = nx.MultiDiGraph()
-        self.G.add_node("init", label="")
-        self.G.add_node("fin", label="")
+        self.sig = Sig(_interned(sig.in_types), _interned(sig.out_types))
+        self._fnid = {"init": None, "fin": None}
+        self._labels = {"init": "", "fin": ""}
+        # Edges are stored column-wise, with ports and datatypes as ids into the
+        # intern tables (whose keys are in id order).
+        self._srcs = []
+        self._tgts = []
+        self._src_port_ids, self._tgt_port_ids, self._dtype_ids = [
+            array("I") for _ in range(3)
+        ]
+        self._port_intern = {}
+        self._dtype_intern = {}
 
     def add_node(self, name, fnid, label=""):
-        self.G.add_node(name, fnid=fnid, label=label)
+        self._fnid[name] = fnid
+        self._labels[name] = label
 
     def add_edge(self, src, src_port, tgt, tgt_port):
         if src == "init":
             raise ValueError("Please use `add_init_edge`")
         if tgt == "fin":
             raise ValueError("Please use `add_final_edge`")
-        src_fnid = self.G.nodes[src]["fnid"]
-        tgt_fnid = self.G.nodes[tgt]["fnid"]
-        src_datatype = fn_types[src_fnid].out_types[src_port]
-        tgt_datatype = fn_types[tgt_fnid].in_types[tgt_port]
-        if src_datatype != tgt_datatype:
-            raise ValueError(f"Type mismatch: {src_datatype} != {tgt_datatype}")
-        datatype = src_datatype
-        self.G.add_edge(
-            src, tgt, src_port=src_port, tgt_port=tgt_port, datatype=datatype
-        )
+        src_port = sys.intern(src_port)
+        tgt_port = sys.intern(tgt_port)
+        fnid = self._fnid
+        datatype = _edge_type(fnid[src], src_port, fnid[tgt], tgt_port)
+        self._append_edge(src, tgt, src_port, tgt_port, datatype)
 
     def add_init_edge(self, src_port, tgt, tgt_port):
-        src_datatype = self.sig.in_types[src_port]
-        tgt_fnid = self.G.nodes[tgt]["fnid"]
-        tgt_datatype = fn_types[tgt_fnid].in_types[tgt_port]
-        if src_datatype != tgt_datatype:
-            raise ValueError(f"Type mismatch: {src_datatype} != {tgt_datatype}")
-        datatype = src_datatype
-        self.G.add_edge(
-            "init", tgt, src_port=src_port, tgt_port=tgt_port, datatype=datatype
-        )
+        src_port = sys.intern(src_port)
+        tgt_port = sys.intern(tgt_port)
+        datatype = self.sig.in_types[src_port]
+        tgt_datatype = _port_dtype[self._fnid[tgt], "in", tgt_port]
+        if __debug__:
+            _check_types(datatype, tgt_datatype)
+        self._append_edge("init", tgt, src_port, tgt_port, datatype)
 
     def add_final_edge(self, src, src_port, tgt_port):
+        src_port = sys.intern(src_port)
+        tgt_port = sys.intern(tgt_port)
+        datatype = _port_dtype[self._fnid[src], "out", src_port]
         tgt_datatype = self.sig.out_types[tgt_port]
-        src_fnid = self.G.nodes[src]["fnid"]
-        src_datatype = fn_types[src_fnid].out_types[src_port]
-        if src_datatype != tgt_datatype:
-            raise ValueError(f"Type mismatch: {src_datatype} != {tgt_datatype}")
-        datatype = src_datatype
-        self.G.add_edge(
-            src, "fin", src_port=src_port, tgt_port=tgt_port, datatype=datatype
+        if __debug__:
+            _check_types(datatype, tgt_datatype)
+        self._append_edge(src, "fin", src_port, tgt_port, datatype)
+
+    def _append_edge(self, src, tgt, src_port, tgt_port, datatype):
+        ports = self._port_intern
+        dtypes = self._dtype_intern
+        self._srcs.append(src)
+        self._tgts.append(tgt)
+        self._src_port_ids.append(ports.setdefault(src_port, len(ports)))
+        self._tgt_port_ids.append(ports.setdefault(tgt_port, len(ports)))
+        self._dtype_ids.append(dtypes.setdefault(datatype, len(dtypes)))
+
+    def edges(self):
+        ports = list(self._port_intern)
+        dtypes = list(self._dtype_intern)
+        for src, tgt, src_port_id, tgt_port_id, dtype_id in zip(
+            self._srcs,
+            self._tgts,
+            self._src_port_ids,
+            self._tgt_port_ids,
+            self._dtype_ids,
+        ):
+            yield src, tgt, ports[src_port_id], ports[tgt_port_id], dtypes[dtype_id]
+
+    def source(self):
+        # Statements are sorted so that the same graph always yields the same
+        # source (and hence hits the render cache) however it was built.
+        labels = self._labels
+        edges = sorted(zip(map(str, self._srcs), map(str, self._tgts)))
+        lines = [f"digraph {_quote(self.name)} {{"]
+        lines.extend(
+            f"\t{_quote(n)} [label={_quote(labels[n])}]"
+            for n in sorted(labels, key=str)
         )
+        lines.extend(f"\t{_quote(s)} -> {_quote(t)}" for s, t in edges)
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def save_source(self):
+        return self._write_source(self.source())
+
+    def render(self):
+        source = self.source()
+        cached_render(source, self._write_source(source) + ".svg")
+
+    def _write_source(self, source):
+        path = f"{self.name}.gv"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+        return path
 
     def save_image(self):
-        G = gv.Digraph(self.name)
-        for n in self.G.nodes:
-            G.node(str(n), label=self.G.nodes[n]["label"])
-        for e in self.G.edges:
-            G.edge(str(e[0]), str(e[1]))
-        G.render(format="svg")
+        self.render()
+
+
+_html_string = re.compile(r"<.*>$", re.DOTALL)
+_unescaped_quote = re.compile(r'(?<!\\)((?:\\\\)*)"')
+
+
+def _quote(s):
+    # As graphviz.quoting.quote: HTML-like strings pass through unquoted, and only
+    # quotes that aren't already escaped get escaped.
+    s = str(s)
+    if _html_string.match(s):
+        return s
+    s = _unescaped_quote.sub(r'\1\\"', s)
+    return f'"{s}"'
+
+
+def cache_path(source):
+    digest = hashlib.blake2b(source.encode()).hexdigest()
+    return os.path.join(cache_dir, digest + ".svg")
+
+
+def store_in_cache(svg, cached):
+    # Copy via a temporary file of our own so that a partial SVG never appears in
+    # the cache, even with concurrent writers. Caching is best effort: if cache_dir
+    # can't be written, renders still succeed, they just aren't cached.
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as f, open(svg, "rb") as src:
+            shutil.copyfileobj(src, f)
+        os.replace(tmp, cached)
+    except OSError:
+        os.remove(tmp)
+
+
+def cached_render(source, target):
+    cached = cache_path(source)
+    if os.path.exists(cached):
+        shutil.copyfile(cached, target)
+    else:
+        subprocess.run(
+            ["dot", "-Tsvg", "-o", target], input=source.encode(), check=True
+        )
+        store_in_cache(target, cached)
 
 
 def test():
@@ -85,3 +226,10 @@ def test():
     f.add_final_edge("CX", "ctl", "q0")
     f.add_final_edge("CX", "tgt", "q1")
     f.save_image()
+
+    g = QFn("labels", Sig({}, {}))
+    g.add_node('say "hi"', "H_gate", label="<<b>H</b>>")
+    g.add_node("esc", "H_gate", label='already \\"escaped\\"')
+    source = g.source()
+    assert '\t"say \\"hi\\"" [label=<<b>H</b>>]' in source
+    assert '\t"esc" [label="already \\"escaped\\""]' in source